@@ -31,22 +31,15 @@ def build_notebook() -> nbf.NotebookNode:
             "\u518d\u73fe\u6027\u306e\u9ad8\u3044\u74b0\u5883\u3092\u6e96\u5099\u3057\u7d50\u679c\u306e\u8aad\u307f\u3084\u3059\u3055\u3092\u78ba\u4fdd\u3059\u308b\u305f\u3081",
             "pandas \u3068 matplotlib/seaborn \u306e\u30d0\u30fc\u30b8\u30e7\u30f3\u304c\u8868\u793a\u3055\u308c\u308b\u3053\u3068",
         )
-        + """from pathlib import Path
-import warnings
+        + """from importlib.metadata import version
+from importlib.util import find_spec
+from pathlib import Path
 
 import pandas as pd
 
-try:
-    import matplotlib.pyplot as plt  # noqa: F401
-    HAS_MPL = True
-except ImportError:
-    plt = None
-    HAS_MPL = False
-
-try:
-    import seaborn as sns  # noqa: F401
-except ImportError:
-    sns = None
+# matplotlib/seaborn の import は重いため、ここでは有無の確認だけ行い描画セルで読み込む
+HAS_MPL = find_spec("matplotlib") is not None
+HAS_SNS = find_spec("seaborn") is not None
 
 pd.set_option("display.max_columns", 40)
 pd.set_option("display.max_rows", 20)
@@ -54,13 +47,11 @@ pd.set_option("display.float_format", "{:.3f}".format)
 
 print(f"pandas={pd.__version__}")
 if HAS_MPL:
-    import matplotlib as mpl  # noqa: WPS433
-
-    print(f"matplotlib={mpl.__version__}")
+    print(f"matplotlib={version('matplotlib')}")
 else:
     print("matplotlib=NOT INSTALLED")
-if sns is not None:
-    print(f"seaborn={sns.__version__}")
+if HAS_SNS:
+    print(f"seaborn={version('seaborn')}")
 else:
     print("seaborn=NOT INSTALLED")
 """
@@ -75,97 +66,199 @@ else:
         )
         + """from typing import List
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from pandas.api.types import is_datetime64_any_dtype
+
 DATA_DIR = Path("data")
 CONTROL_PATH = DATA_DIR / "equipment_control_logs.csv"
 STATUS_PATH = DATA_DIR / "equipment_status_events.csv"
+PARQUET_CACHE_VERSION = 2
 NA_TOKENS = ["NULL"]
+# Arrow の null_values は既定値を置き換えるため、pd.read_csv の既定の欠損表記も含めて渡す
+CSV_NULL_VALUES = sorted(
+    {
+        "",
+        "#N/A",
+        "#N/A N/A",
+        "#NA",
+        "-1.#IND",
+        "-1.#QNAN",
+        "-NaN",
+        "-nan",
+        "1.#IND",
+        "1.#QNAN",
+        "<NA>",
+        "N/A",
+        "NA",
+        "NaN",
+        "None",
+        "n/a",
+        "nan",
+        "null",
+        *NA_TOKENS,
+    }
+)
 BOOL_MAP = {"TRUE": True, "FALSE": False, "true": True, "false": False}
 
+CONTROL_DATETIME_COLS = [
+    "OrderReceiptDate",
+    "TimerSetDate",
+    "CompleteDate",
+    "CreatedDate",
+    "UpdatedDate",
+    "DeletedDate",
+]
+STATUS_DATETIME_COLS = [
+    "ReportedDate",
+    "DetectionDate",
+    "ErrorDate",
+    "CreatedDate",
+    "UpdatedDate",
+    "DeletedDate",
+]
+# 読み込み直後に最終的な型へ揃え、推論結果の再変換を省く
+CONTROL_DTYPES = {
+    "IsDelete": "boolean",
+    "ControlResult": "category",
+    "EquipmentTypeId": "category",
+    "ErrorCode": "string",
+    "ErrorReason": "string",
+}
+STATUS_DTYPES = {
+    "IsDelete": "boolean",
+    "MessageName": "category",
+    "AliveStatus": "category",
+}
+
 
 def parse_datetimes(df: pd.DataFrame, columns: List[str], *, utc: bool = True) -> pd.DataFrame:
     for column in columns:
         if column not in df.columns:
             continue
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=UserWarning)
-            df[column] = pd.to_datetime(df[column], errors="coerce", utc=utc)
+        series = df[column]
+        if is_datetime64_any_dtype(series):
+            # 読み込み時に解析済みの列は単位とタイムゾーンだけ揃える
+            series = series.dt.as_unit("ns")
+            if utc:
+                series = (
+                    series.dt.tz_localize("UTC")
+                    if series.dt.tz is None
+                    else series.dt.tz_convert("UTC")
+                )
+            df[column] = series
+            continue
+        # format を明示して dateutil による要素単位の解析を避ける
+        uniques = series.dropna().unique()
+        if 0 < uniques.size < 0.5 * len(series):
+            # 同一日時が多い列はユニーク値だけ解析して写像し直す
+            parsed = pd.to_datetime(uniques, errors="coerce", utc=utc, format="ISO8601")
+            df[column] = series.map(pd.Series(parsed, index=uniques))
+        else:
+            df[column] = pd.to_datetime(series, errors="coerce", utc=utc, format="ISO8601")
     return df
 
 
-def load_control_logs() -> pd.DataFrame:
-    df = pd.read_csv(CONTROL_PATH, encoding="utf-8-sig", na_values=NA_TOKENS)
-    datetime_cols = [
-        "OrderReceiptDate",
-        "TimerSetDate",
-        "CompleteDate",
-        "CreatedDate",
-        "UpdatedDate",
-        "DeletedDate",
+def read_log_csv(path: Path, datetime_cols: List[str], dtypes: dict) -> pd.DataFrame:
+    header = pd.read_csv(path, encoding="utf-8-sig", nrows=0).columns
+    # Arrow は "0x80" のような値を整数と推論するため、プロパティ列と
+    # 文字列指定の列は推論させずに文字列で固定する
+    text_cols = [
+        column
+        for column in header
+        if column.startswith(("Property", "ErrorProperty")) or dtypes.get(column) == "string"
     ]
-    df = parse_datetimes(df, datetime_cols)
-    df["IsDelete"] = df["IsDelete"].fillna(0).astype(bool)
-    df["ControlResult"] = df["ControlResult"].astype("category")
-    df["EquipmentTypeId"] = df["EquipmentTypeId"].astype("category")
-    df["duration_to_complete_min"] = (
-        df["CompleteDate"] - df["OrderReceiptDate"]
-    ).dt.total_seconds() / 60
-    df["has_error"] = df[["ErrorCode", "ErrorReason"]].notna().any(axis=1)
+    # Arrow の CSV リーダーで複数コアを使って解析し、ISO8601 の日時も直接変換させる
+    table = pa_csv.read_csv(
+        path,
+        convert_options=pa_csv.ConvertOptions(
+            null_values=CSV_NULL_VALUES,
+            strings_can_be_null=True,
+            column_types={column: pa.string() for column in text_cols},
+        ),
+    )
+    # Arrow 側のバッファを列ごとに解放しながら変換し、二重保持によるピークメモリを抑える
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    df = df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+    # Arrow で読めなかった列の救済と UTC への正規化
+    return parse_datetimes(df, datetime_cols)
+
+
+def parquet_cache_path(source_path: Path) -> Path:
+    # 読み込み処理を変えたら版を上げ、古い処理で書いたキャッシュを使わないようにする
+    return source_path.with_suffix(f".v{PARQUET_CACHE_VERSION}.parquet")
+
+
+def is_fresh_cache(cache_path: Path, source_path: Path) -> bool:
+    return cache_path.exists() and cache_path.stat().st_mtime >= source_path.stat().st_mtime
+
+
+def read_parquet_cache(cache_path: Path, dtypes: dict) -> pd.DataFrame:
+    df = pd.read_parquet(cache_path)
+    # 整数値を持つ category などは Parquet から復元されないため型を付け直す。
+    # IsDelete は書き出し前に bool へ確定しているので対象外
+    restore = {
+        column: dtype
+        for column, dtype in dtypes.items()
+        if column in df.columns and column != "IsDelete"
+    }
+    return df.astype(restore)
+
+
+def load_control_logs() -> pd.DataFrame:
+    # 型変換済みの結果を Parquet に残し、CSV が更新されるまで再解析しない
+    parquet_path = parquet_cache_path(CONTROL_PATH)
+    if is_fresh_cache(parquet_path, CONTROL_PATH):
+        return read_parquet_cache(parquet_path, CONTROL_DTYPES)
+    df = read_log_csv(CONTROL_PATH, CONTROL_DATETIME_COLS, CONTROL_DTYPES)
+    df["IsDelete"] = df["IsDelete"].fillna(False).astype(bool)
+    # Timedelta を経由せず int64 のナノ秒同士で差を取り、最後に分へ変換する
+    complete_ns = df["CompleteDate"].values.view("i8")
+    order_ns = df["OrderReceiptDate"].values.view("i8")
+    nat = np.iinfo(np.int64).min
+    df["duration_to_complete_min"] = np.where(
+        (complete_ns == nat) | (order_ns == nat), np.nan, (complete_ns - order_ns) / 6e10
+    )
+    df["has_error"] = df["ErrorCode"].notna() | df["ErrorReason"].notna()
+    df.to_parquet(parquet_path, index=False)
     return df
 
 
 def load_status_events() -> pd.DataFrame:
-    df = pd.read_csv(STATUS_PATH, encoding="utf-8-sig", na_values=NA_TOKENS)
-    datetime_cols = [
-        "ReportedDate",
-        "DetectionDate",
-        "ErrorDate",
-        "CreatedDate",
-        "UpdatedDate",
-        "DeletedDate",
-    ]
-    df = parse_datetimes(df, datetime_cols)
-    df["IsDelete"] = df["IsDelete"].fillna(0).astype(bool)
-    if "MessageName" in df.columns:
-        df["MessageName"] = df["MessageName"].astype("category")
-    if "AliveStatus" in df.columns:
-        df["AliveStatus"] = df["AliveStatus"].astype("category")
+    parquet_path = parquet_cache_path(STATUS_PATH)
+    if is_fresh_cache(parquet_path, STATUS_PATH):
+        return read_parquet_cache(parquet_path, STATUS_DTYPES)
+    df = read_log_csv(STATUS_PATH, STATUS_DATETIME_COLS, STATUS_DTYPES)
+    df["IsDelete"] = df["IsDelete"].fillna(False).astype(bool)
+    df.to_parquet(parquet_path, index=False)
     return df
 
 
 def extract_status_properties(df: pd.DataFrame, prefix: str, limit: int) -> pd.DataFrame:
-    records = []
-    for ordinal in range(1, limit + 1):
-        code_col = f"{prefix}Code{ordinal}"
-        name_col = f"{prefix}Name{ordinal}"
-        value_col = f"{prefix}Value{ordinal}"
-        desc_col = f"{prefix}Description{ordinal}"
-        available = [
-            col
-            for col in (code_col, name_col, value_col, desc_col)
-            if col in df.columns
-        ]
-        if not available:
-            continue
-        subset = df[["Id"] + available].copy()
-        subset.rename(
-            columns={
-                "Id": "event_id",
-                code_col: "code",
-                name_col: "name",
-                value_col: "value",
-                desc_col: "description",
-            },
-            inplace=True,
-        )
-        subset["ordinal"] = ordinal
-        subset.dropna(subset=["code", "name", "value"], how="all", inplace=True)
-        subset["value"] = subset["value"].replace(BOOL_MAP)
-        records.append(subset)
-    if not records:
+    fields = {"Code": "code", "Name": "name", "Value": "value", "Description": "description"}
+    wide_cols = [
+        f"{prefix}{field}{ordinal}" for ordinal in range(1, limit + 1) for field in fields
+    ]
+    if not any(col in df.columns for col in wide_cols):
         return pd.DataFrame(
             columns=["event_id", "code", "name", "value", "description", "ordinal"]
         )
-    return pd.concat(records, ignore_index=True)
+    # 序数ごとのコピーと concat を避け、(行, 序数, 項目) の3次元配列から一度に縦持ちへ変換する。
+    # 行順は従来どおり序数ごとにまとまるよう、序数を先頭の軸にしてから平らにする
+    n = len(df)
+    values = df.reindex(columns=wide_cols).to_numpy(dtype=object).reshape(n, limit, len(fields))
+    values = values.transpose(1, 0, 2).reshape(n * limit, len(fields))
+    # code/name/value がすべて欠損の行は DataFrame を組み立てる前に落とす
+    keep = ~pd.isna(values[:, :3]).all(axis=1)
+    long = pd.DataFrame(values[keep], columns=list(fields.values()))
+    long.insert(0, "event_id", np.tile(df["Id"].to_numpy(), limit)[keep])
+    long["ordinal"] = np.repeat(np.arange(1, limit + 1), n)[keep]
+    # replace は正規表現等の分岐を通るため、map で真偽値だけ置き換える
+    mapped = long["value"].map(BOOL_MAP)
+    long["value"] = mapped.where(mapped.notna(), long["value"])
+    return long
 """
     )
     cells.append(nbf.v4.new_code_cell(cell2_code))
@@ -254,10 +347,11 @@ status_props.head(), status_error_props.head(), props_summary
             "\u65e5\u6b21\u4ef6\u6570\u30c6\u30fc\u30d6\u30eb\u3068\u5236\u5fa1\u7d50\u679c\u306e\u96c6\u8a08\u3001\u304a\u3088\u3073\u53ef\u8996\u5316\u307e\u305f\u306f\u4ee3\u66ff\u51fa\u529b\u304c\u5f97\u3089\u308c\u308b\u3053\u3068",
         )
         + """
+# 補助列を作らず、日付に丸めた Series をそのままグループキーに渡す
+complete_local = control_df["CompleteDate"].dt.tz_convert("Asia/Tokyo").dt.floor("D")
 control_daily = (
     control_df.dropna(subset=["CompleteDate"])
-    .assign(complete_local=lambda df: df["CompleteDate"].dt.tz_convert("Asia/Tokyo"))
-    .groupby([pd.Grouper(key="complete_local", freq="D"), "EquipmentTypeId"], observed=True)
+    .groupby([complete_local.rename("complete_local"), "EquipmentTypeId"], observed=True)
     .size()
     .reset_index(name="count")
 )
@@ -270,7 +364,10 @@ result_by_type = (
     .sort_values("total", ascending=False)
 )
 
-if HAS_MPL and sns is not None:
+if HAS_MPL and HAS_SNS:
+    import matplotlib.pyplot as plt  # noqa: WPS433
+    import seaborn as sns  # noqa: WPS433
+
     plt.figure(figsize=(8, 4))
     sns.lineplot(data=control_daily, x="complete_local", y="count", hue="EquipmentTypeId", marker="o")
     plt.title("日次の操作件数（設備種別別）")
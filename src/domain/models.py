@@ -9,9 +9,15 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional, Sequence
 import datetime as dt
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 
+# 操作と状態変化を同一事象とみなす許容差（分）の既定値
+DEFAULT_TOLERANCE_MINUTES = 5
+
 
 @dataclass(frozen=True)
 class OperationRecord:
@@ -136,6 +142,147 @@ class MergedRecord:
     property_value: Optional[str] = None
 
 
+def to_utc_datetime(series: pd.Series) -> pd.Series:
+    """日時列を UTC の datetime64 に揃える。
+
+    既に datetime64 型の列（Excel/Parquet から読んだ日時セルなど）は文字列解析を
+    行わず、タイムゾーンの付与・変換だけで済ませる。それ以外は ``pd.to_datetime`` で解析する。
+
+    Parameters
+    ----------
+    series : pandas.Series
+        日時を表す列。
+
+    Returns
+    -------
+    pandas.Series
+        UTC のタイムゾーン付き datetime64 列。
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series if str(series.dt.tz) == "UTC" else series.dt.tz_convert("UTC")
+    if pd.api.types.is_datetime64_dtype(series):
+        return series.dt.tz_localize("UTC")
+    # to_datetime は cache を有効化して繰り返し値を高速変換
+    return pd.to_datetime(series, utc=True, cache=True)
+
+
+def _add_missing_columns(df: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+    """不足している列を欠損値の列としてまとめて追加する。
+
+    不足列は1つのブロックとして確保し、既存列は ``concat(copy=False)`` でコピーせずに連結する。
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        対象の DataFrame。
+    columns : Sequence[str]
+        存在を保証したい列一覧。
+
+    Returns
+    -------
+    pandas.DataFrame
+        不足列を追加した DataFrame。不足がなければ ``df`` をそのまま返す。
+    """
+    missing = [c for c in columns if c not in df.columns]
+    if not missing:
+        return df
+    filler = pd.DataFrame(None, index=df.index, columns=missing, dtype=object)
+    return pd.concat([df, filler], axis=1, copy=False)
+
+
+def _to_arrow_string(series: pd.Series) -> pd.Series:
+    """文字列だけを持つ object 列を Arrow ベースの string 型に変換する。
+
+    category・日時・数値など object 以外の列や、数値が混在する列はそのまま返す。
+
+    Parameters
+    ----------
+    series : pandas.Series
+        対象の列。
+
+    Returns
+    -------
+    pandas.Series
+        ``string[pyarrow]`` に変換した列、または元の列。
+    """
+    if series.dtype != object or pd.api.types.infer_dtype(series, skipna=True) != "string":
+        return series
+    return series.astype(pd.StringDtype("pyarrow"))
+
+
+def _shared_group_key(
+    op: pd.DataFrame, st: pd.DataFrame, key_cols: Sequence[str]
+) -> tuple[np.ndarray, np.ndarray]:
+    """2つの DataFrame で比較可能な整数の複合キーを作る。
+
+    列ごとに両フレームをまとめて1回だけ factorize して共通のコードを得て、
+    必要なビット幅でシフトして1つの int64 に詰める。コードはキー生成にだけ使い、
+    入力の列は書き換えない。
+    合計が 63 ビットを超える場合は、列ごとに合成して factorize し直す方式に切り替える。
+    行ごとの文字列ハッシュを計算せずに済み、merge_asof の ``by`` に int64 の列を渡せる。
+    欠損は空文字と同じ値として扱う。
+
+    Parameters
+    ----------
+    op : pandas.DataFrame
+        操作側の DataFrame。
+    st : pandas.DataFrame
+        状態変化側の DataFrame。
+    key_cols : Sequence[str]
+        キーを構成する列。両フレームに存在すること。
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        操作側・状態側それぞれの int64 キー。値が等しい行同士は同じ属性を持つ。
+    """
+    n_op = len(op)
+    columns = []
+    for col in key_cols:
+        codes, uniques = pd.factorize(pd.concat([op[col], st[col]], ignore_index=True))
+        codes = codes.astype(np.int64, copy=False)
+        empty = uniques.get_loc("") if "" in uniques else len(uniques)
+        codes[codes < 0] = empty
+        columns.append((codes, len(uniques) + 1))
+
+    widths = [max(1, (cardinality - 1).bit_length()) for _, cardinality in columns]
+    keys = np.zeros(n_op + len(st), dtype=np.int64)
+    if sum(widths) <= 63:
+        shift = 0
+        for (codes, _), width in zip(columns, widths):
+            keys |= codes << shift
+            shift += width
+    else:
+        for codes, cardinality in columns:
+            # 合成前のキーは行数未満に詰め直しているため、積を取っても int64 に収まる
+            keys, _ = pd.factorize(keys * cardinality + codes)
+    return keys[:n_op], keys[n_op:]
+
+
+def _sorted_by(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    """merge_asof 用に ``col`` の昇順へ並べた DataFrame を返す。
+
+    merge_asof は on キーの全体ソートだけを要求し、by 単位のグループ化は内部で行う。
+    既に昇順なら並べ替え（全列の take）を省き、そうでなければ安定ソートで同時刻の
+    行順を入力順のまま保つ。
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        並べ替える DataFrame。
+    col : str
+        並べ替えに使う日時列。
+
+    Returns
+    -------
+    pandas.DataFrame
+        ``col`` の昇順に並んだ DataFrame。
+    """
+    if df[col].is_monotonic_increasing:
+        return df
+    return df.sort_values(col, kind="mergesort", ignore_index=True)
+
+
 class MergedLogDataset:
     """突合結果を保持し、保存・復元を提供する DataFrame ラッパー。"""
 
@@ -156,7 +303,14 @@ class MergedLogDataset:
         MergedLogDataset
             復元されたデータセット。
         """
-        return cls(pd.read_parquet(path))
+        # Arrow のバッファを列ごとに解放しながら変換し、復元時のピークメモリを抑える。
+        # 文字列列は既定だと Python オブジェクトに戻るため string[pyarrow] を明示する
+        table = pq.read_table(path)
+        string_dtype = pd.StringDtype("pyarrow")
+        types_mapper = {pa.string(): string_dtype, pa.large_string(): string_dtype}.get
+        return cls(
+            table.to_pandas(types_mapper=types_mapper, split_blocks=True, self_destruct=True)
+        )
 
     def to_parquet(self, path: str) -> None:
         """Parquet に保存する。
@@ -166,7 +320,17 @@ class MergedLogDataset:
         path : str
             書き出すファイルパス。
         """
-        self.df.to_parquet(path, index=False)
+        # 再読込が中心のため圧縮率の高い zstd とし、行グループを大きめに取って
+        # 統計情報による列・行グループの読み飛ばしを効かせる
+        pq.write_table(
+            pa.Table.from_pandas(self.df, preserve_index=False),
+            path,
+            compression="zstd",
+            compression_level=3,
+            row_group_size=1_000_000,
+            use_dictionary=True,
+            write_statistics=True,
+        )
 
     def to_csv(self, path: str) -> None:
         """CSV に保存する（再利用や別ツール連携用）。
@@ -202,9 +366,10 @@ class MergedLogDataset:
         Returns
         -------
         MergedLogDataset
-            突合済みデータセット。
+            突合済みデータセット。文字列だけを持つ列は ``string[pyarrow]`` 型、
+            その他の列は状態変化ログの型のまま返す。
         """
-        # 最低限必要な列だけをコピーしてメモリ確保とコピー回数を削減
+        # 最低限必要な列だけを取り出してメモリ確保とコピー回数を削減
         op_cols = [
             "ContractId",
             "OrderReceiptDate",
@@ -216,20 +381,23 @@ class MergedLogDataset:
             "PropertyName",
             "PropertyValue",
         ]
-        op = operation_df.loc[:, [c for c in op_cols if c in operation_df.columns]].copy()
-        st = state_df.copy()
+        # 両側とも列データはコピーせず参照だけを持つ新しい DataFrame にする。
+        # 以降は列の差し替え・追加だけを行うため入力を汚さない
+        op = pd.DataFrame(
+            {c: operation_df[c] for c in op_cols if c in operation_df.columns}, copy=False
+        )
+        st = state_df.copy(deep=False)
 
         if tolerance_minutes is None:
             env_val = os.getenv("MERGE_TOLERANCE_MINUTES")
-            tolerance_minutes = int(env_val) if env_val else 5
+            tolerance_minutes = int(env_val) if env_val else DEFAULT_TOLERANCE_MINUTES
 
         tol = pd.Timedelta(minutes=tolerance_minutes)
 
-        # to_datetime は cache を有効化して繰り返し値を高速変換
-        op["OrderReceiptDate"] = pd.to_datetime(op["OrderReceiptDate"], utc=True, cache=True)
-        st["ReportedDate"] = pd.to_datetime(st["ReportedDate"], utc=True, cache=True)
+        op["OrderReceiptDate"] = to_utc_datetime(op["OrderReceiptDate"])
+        st["ReportedDate"] = to_utc_datetime(st["ReportedDate"])
 
-        # 状態と操作で共通して比較できる属性を合わせ込んだハッシュキーを作り、
+        # 状態と操作で共通して比較できる属性を合わせ込んだ整数キーを作り、
         # その単位で merge_asof することで時間以外も一致したものだけを突合。
         op.rename(
             columns={
@@ -251,58 +419,62 @@ class MergedLogDataset:
             "PropertyValue1",
         ]
 
-        for df in (op, st):
-            for col in key_cols:
-                if col not in df:
-                    df[col] = None
+        op = _add_missing_columns(op, key_cols)
+        st = _add_missing_columns(st, key_cols)
 
-        make_key = lambda df: pd.util.hash_pandas_object(  # noqa: E731
-            df[key_cols].fillna(""), index=False
-        )
+        # キー生成は共通の整数コードだけで行い、出力する状態側の列の型は変えない
+        k_op, k_st = _shared_group_key(op, st, key_cols)
 
-        op_sorted = op.assign(_k=make_key(op)).sort_values(["_k", "OrderReceiptDate"])
-        st_sorted = st.assign(_k=make_key(st)).sort_values(["_k", "ReportedDate"])
-
-        merged = pd.merge_asof(
-            st_sorted,
+        # 操作側の属性列は突合キー _k に集約済みで、出力にも状態側の列しか残さないため、
+        # merge_asof に渡すのはキーと日時の2列だけにして並べ替え・結合の転送量を減らす。
+        # 状態側は assign（全列コピー）を使わず浅いコピーへ列を追加するだけにする
+        op_sorted = _sorted_by(
+            pd.DataFrame({"_k": k_op, "OrderReceiptDate": op["OrderReceiptDate"]}),
+            "OrderReceiptDate",
+        )
+        st["_k"] = k_st
+        merged = _sorted_by(st, "ReportedDate")
+        # 並べ替え（take）を省いた場合、状態側の列は呼び出し元の state_df と同じバッファを指す
+        shares_input = merged is st
+        merged.index = pd.RangeIndex(len(merged))
+
+        # 相手側に同じキーが存在しない行は突合しようがないため、両側とも事前に除外する。
+        # 状態側は全列を merge_asof に通さず、キーと日時だけで突合して結果を書き戻す
+        st_keys = merged["_k"].to_numpy()
+        op_keys = op_sorted["_k"].to_numpy()
+        st_hit = np.isin(st_keys, op_keys)
+        op_sorted = op_sorted.loc[np.isin(op_keys, st_keys[st_hit])]
+        probe = pd.DataFrame(
+            {"_k": st_keys[st_hit], "ReportedDate": merged["ReportedDate"][st_hit].array}
+        )
+        matched = pd.merge_asof(
+            probe,
             op_sorted,
             left_on="ReportedDate",
             right_on="OrderReceiptDate",
             by="_k",
             direction="nearest",
             tolerance=tol,
-            suffixes=("_state", "_op"),
         )
-
-        merged["is_remote_operation"] = merged["OrderReceiptDate"].notna()
-        merged["time_diff_seconds"] = (
-            (merged["ReportedDate"] - merged["OrderReceiptDate"])
-            .abs()
-            .dt.total_seconds()
+        order_date = pd.Series(
+            pd.NaT, index=merged.index, dtype=op_sorted["OrderReceiptDate"].dtype
         )
-        merged.loc[~merged["is_remote_operation"], "time_diff_seconds"] = None
+        order_date[st_hit] = matched["OrderReceiptDate"].array
+        merged["OrderReceiptDate"] = order_date
 
-        # 状態変化側の列を優先して残し、suffix を除去する
-        state_cols = {c[:-6]: c for c in merged.columns if c.endswith("_state")}
-        merged.rename(columns={v: k for k, v in state_cols.items()}, inplace=True)
-
-        # 出力用の汎用プロパティ名を付与（状態側を優先）
-        merged["property_code"] = merged["PropertyCode1"] if "PropertyCode1" in merged else None
-        merged["property_name"] = merged["PropertyName1"] if "PropertyName1" in merged else None
-        merged["property_value"] = merged["PropertyValue1"] if "PropertyValue1" in merged else None
-
-        ensure_cols = [
-            "FloorCode",
-            "RoomName",
-            "EquipmentTypeId",
-            "EquipmentName",
-            "property_code",
-            "property_name",
-            "property_value",
-        ]
-        for col in ensure_cols:
-            if col not in merged:
-                merged[col] = None
+        merged["is_remote_operation"] = merged["OrderReceiptDate"].notna()
+        # Timedelta 列を経由せず NumPy 上で差・絶対値・秒換算をまとめて行う。
+        # 絶対値は差の配列へ上書きし、中間配列を1つに抑える。
+        # 突合できなかった行は NaT のまま秒換算されて NaN になるためマスク不要
+        diff = merged["ReportedDate"].values - merged["OrderReceiptDate"].values
+        np.abs(diff, out=diff)
+        merged["time_diff_seconds"] = diff / np.timedelta64(1, "s")
+
+        # 出力用の汎用プロパティ名を付与（状態側を優先）。
+        # 属性列はキー列として両側に補完済みのため、出力列の存在確認は不要
+        merged["property_code"] = merged["PropertyCode1"]
+        merged["property_name"] = merged["PropertyName1"]
+        merged["property_value"] = merged["PropertyValue1"]
 
         cols_front = [
             "ContractId",
@@ -318,12 +490,20 @@ class MergedLogDataset:
             "property_name",
             "property_value",
         ]
-        drop_cols = set(state_cols.values()) | {"_k"}
-        remaining = [
-            c
-            for c in merged.columns
-            if c not in cols_front and c not in drop_cols and not c.endswith("_op")
-        ]
-        final_df = merged[cols_front + remaining]
+        remaining = [c for c in merged.columns if c not in cols_front and c != "_k"]
+        # merged[cols] は全列を take してコピーするため、列を参照したまま並べ替える。
+        # 素通しの文字列列は Arrow 形式に変換し、セルごとの Python オブジェクトをなくす。
+        # 変換されずに残った列のうち、入力や他の出力列とバッファを共有するものだけはコピーし、
+        # 結果への書き込みが呼び出し元の DataFrame に波及しないようにする
+        computed = {"OrderReceiptDate", "is_remote_operation", "time_diff_seconds"}
+        aliased = {"property_code", "property_name", "property_value"}
+        columns = {}
+        for c in cols_front + remaining:
+            col = merged[c]
+            converted = _to_arrow_string(col)
+            if converted is col and c not in computed and (shares_input or c in aliased):
+                converted = col.copy()
+            columns[c] = converted
+        final_df = pd.DataFrame(columns, copy=False)
 
         return cls(final_df)
@@ -7,6 +7,8 @@ import datetime as dt
 import hashlib
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 import logging
 
@@ -15,6 +17,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 CACHE_DIR = BASE_DIR / ".cache"
 CACHE_DIR.mkdir(exist_ok=True)
 
+# ログは低カーディナリティの文字列列が中心のため、辞書エンコード＋zstd で書き出す。
+# 行グループは小さめにして統計情報による読み飛ばしを効かせる
+PARQUET_WRITE_OPTIONS = dict(
+    engine="pyarrow",
+    compression="zstd",
+    compression_level=3,
+    use_dictionary=True,
+    row_group_size=64_000,
+    data_page_size=1 << 20,
+)
+
 
 def build_cache_key(
     latest_path: Path,
@@ -46,7 +59,9 @@ def build_cache_key(
     str
         期間と対象者を含んだ一意のキャッシュキー。
     """
-    hasher = hashlib.sha256()
+    # 暗号強度は不要なため、標準ライブラリで SHA-256 より高速な BLAKE2b を使う。
+    # 32 バイト出力にして従来と同じ長さ (64 文字) のキーに揃える
+    hasher = hashlib.blake2b(digest_size=32)
     hasher.update(str(latest_path).encode("utf-8"))
     hasher.update(str(latest_path.stat().st_mtime_ns).encode("utf-8"))
     hasher.update(",".join(operation_cols + state_cols).encode("utf-8"))
@@ -76,6 +91,205 @@ def cache_paths(key: str) -> Tuple[Path, Path]:
     return base.with_suffix(".op.parquet"), base.with_suffix(".state.parquet")
 
 
+def merged_cache_path(key: str, tolerance_minutes: int) -> Path:
+    """突合済みデータセットのキャッシュパスを返す。
+
+    操作/状態の生データキャッシュと同じキーに許容差を加えて識別するため、
+    許容差だけを変えた場合も生データのキャッシュは再利用できる。
+
+    Parameters
+    ----------
+    key : str
+        :func:`build_cache_key` で得たキー。
+    tolerance_minutes : int
+        突合に用いた許容差（分）。
+
+    Returns
+    -------
+    pathlib.Path
+        突合済み Parquet のパス。
+    """
+    return CACHE_DIR / f"{key}.tol{tolerance_minutes}.merged.parquet"
+
+
+def sheet_cache_path(latest_path: Path, sheet_key: str) -> Path:
+    """Excel シート全体を Parquet 化したキャッシュのパスを返す。
+
+    Parameters
+    ----------
+    latest_path : pathlib.Path
+        元となる Excel ファイルのパス。
+    sheet_key : str
+        シートを識別する短いキー（``"op"`` / ``"state"`` など）。
+
+    Returns
+    -------
+    pathlib.Path
+        ファイル名と更新時刻 (ns) を含んだ Parquet のパス。
+    """
+    mtime_ns = latest_path.stat().st_mtime_ns
+    return CACHE_DIR / f"{latest_path.stem}.{mtime_ns}.{sheet_key}.parquet"
+
+
+def _contract_id_filters(schema: pa.Schema, contract_ids: Sequence[str]) -> list:
+    """ContractId の絞り込み条件を Parquet の列型に合わせたフィルタへ変換する。
+
+    値の集合は列と同じ型へキャストしてから渡す。キャストできない場合は条件を付けず、
+    呼び出し側の pandas での絞り込みに任せる。
+
+    Parameters
+    ----------
+    schema : pyarrow.Schema
+        シートキャッシュのスキーマ。
+    contract_ids : Sequence[str]
+        抽出対象の ContractId 一覧。
+
+    Returns
+    -------
+    list
+        ``pandas.read_parquet`` の ``filters`` に渡せる条件のリスト。
+    """
+    if "ContractId" not in schema.names:
+        return []
+    try:
+        values = pa.array(list(contract_ids)).cast(schema.field("ContractId").type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return []
+    return [("ContractId", "in", values.to_pylist())]
+
+
+def _date_range_filters(
+    schema: pa.Schema,
+    date_col: str,
+    start_ts: pd.Timestamp,
+    end_ts: Optional[pd.Timestamp],
+) -> list:
+    """日時列の範囲条件を Parquet の列型に合わせたフィルタへ変換する。
+
+    Excel 由来の日時はタイムゾーンなしで保存されているため、UTC の境界値を
+    列と同じタイムゾーン表現に揃える。日時型でない列には条件を付けない。
+
+    Parameters
+    ----------
+    schema : pyarrow.Schema
+        シートキャッシュのスキーマ。
+    date_col : str
+        絞り込む日時列。
+    start_ts : pandas.Timestamp
+        期間の開始日時 (UTC)。
+    end_ts : pandas.Timestamp or None
+        期間の終了日時 (UTC)。None の場合は上限なし。
+
+    Returns
+    -------
+    list
+        ``pandas.read_parquet`` の ``filters`` に渡せる条件のリスト。
+    """
+    if date_col not in schema.names:
+        return []
+    field_type = schema.field(date_col).type
+    if not pa.types.is_timestamp(field_type):
+        return []
+    tz = field_type.tz
+    bounds = [(">=", start_ts)] + ([("<=", end_ts)] if end_ts is not None else [])
+    return [
+        (date_col, op, ts.tz_convert(tz) if tz else ts.tz_convert(None))
+        for op, ts in bounds
+    ]
+
+
+def load_sheet_cache(
+    path: Path,
+    columns: Sequence[str],
+    contract_ids: Optional[Sequence[str]] = None,
+    date_range: Optional[
+        Tuple[str, pd.Timestamp, Optional[pd.Timestamp]]
+    ] = None,
+) -> Optional[pd.DataFrame]:
+    """シートキャッシュから必要な列・行だけを読み込む。
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        :func:`sheet_cache_path` で得たパス。
+    columns : Sequence[str]
+        読み込む列一覧。
+    contract_ids : Sequence[str] or None, default None
+        指定した場合は ContractId で絞り込んだ行だけを読む。条件は Parquet の
+        行グループ統計に押し下げられ、該当しない行グループは展開されない。
+        列の型に合わせられない ID が含まれる場合は絞り込まずに読む。
+    date_range : tuple[str, pandas.Timestamp, pandas.Timestamp or None] or None, default None
+        ``(日時列, 開始, 終了)``。指定した場合は期間外の行も Arrow 側で落とし、
+        pandas へは変換しない。
+
+    Returns
+    -------
+    pandas.DataFrame or None
+        キャッシュが存在する場合は指定列の DataFrame。存在しない/読めない場合や、
+        型の混在で保存しなかった列を要求された場合は None。壊れたキャッシュは削除する。
+    """
+    if not path.exists():
+        return None
+    try:
+        schema = pq.read_schema(path)
+    except Exception as exc:  # 破損したキャッシュは作り直させる
+        logging.warning("sheet cache load failed (%s); reading Excel", exc)
+        path.unlink(missing_ok=True)
+        return None
+    missing = [c for c in columns if c not in schema.names]
+    if missing:
+        # store_sheet_cache が除外した列。キャッシュ自体は有効なので残す
+        logging.warning("sheet cache lacks columns %s; reading Excel", missing)
+        return None
+    if contract_ids is not None and len(contract_ids) == 0:
+        return schema.empty_table().select(list(columns)).to_pandas()
+    try:
+        filters = []
+        if contract_ids is not None:
+            filters.extend(_contract_id_filters(schema, contract_ids))
+        if date_range is not None:
+            filters.extend(_date_range_filters(schema, *date_range))
+        return pd.read_parquet(path, columns=list(columns), filters=filters or None)
+    except Exception as exc:  # 破損など
+        logging.warning("sheet cache load failed (%s); reading Excel", exc)
+        path.unlink(missing_ok=True)
+        return None
+
+
+def store_sheet_cache(path: Path, df: pd.DataFrame) -> None:
+    """シート全体の DataFrame を Parquet に保存する。
+
+    ContractId で並べ替えたうえで小さめの行グループに分けて書き出し、
+    :func:`load_sheet_cache` の絞り込みで行グループを読み飛ばせるようにする。
+    文字列と数値が混在する列は Parquet に書けないため、その列だけ除いて保存する
+    （除いた列を読もうとした場合は :func:`load_sheet_cache` が None を返す）。
+    それ以外の理由で書き出せない場合は警告だけ出してキャッシュを作らない。
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        :func:`sheet_cache_path` で得たパス。
+    df : pandas.DataFrame
+        シート全体の DataFrame。
+    """
+    try:
+        mixed = [
+            column
+            for column in df.columns
+            if df[column].dtype == object
+            and pd.api.types.infer_dtype(df[column], skipna=True) in ("mixed", "mixed-integer")
+        ]
+        if mixed:
+            logging.warning("sheet cache skips mixed-type columns: %s", mixed)
+            df = df.drop(columns=mixed)
+        if "ContractId" in df.columns:
+            df = df.sort_values("ContractId", kind="mergesort", ignore_index=True)
+        df.to_parquet(path, index=False, **PARQUET_WRITE_OPTIONS)
+    except Exception as exc:  # 並べ替えや書き出しに失敗した場合
+        logging.warning("sheet cache store failed (%s); continuing without cache", exc)
+        path.unlink(missing_ok=True)
+
+
 def load_cached(key: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
     """キャッシュを読み込み、存在しなければ None を返す。
 
@@ -120,5 +334,11 @@ def store_cache(key: str, op_df: pd.DataFrame, state_df: pd.DataFrame) -> None:
         状態変化ログ DataFrame。
     """
     op_path, state_path = cache_paths(key)
-    op_df.to_parquet(op_path, index=False)
-    state_df.to_parquet(state_path, index=False)
+    try:
+        op_df.to_parquet(op_path, index=False, **PARQUET_WRITE_OPTIONS)
+        state_df.to_parquet(state_path, index=False, **PARQUET_WRITE_OPTIONS)
+    except Exception as exc:  # 型が混在する列を選んだ場合の ArrowTypeError など
+        logging.warning("cache store failed (%s); continuing without cache", exc)
+        # 片方だけ残ると load_cached が不完全なキャッシュを読むため両方消す
+        for p in (op_path, state_path):
+            p.unlink(missing_ok=True)
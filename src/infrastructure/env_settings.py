@@ -2,10 +2,40 @@
 from __future__ import annotations
 
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Sequence
 
 
+@lru_cache(maxsize=4)
+def _parse_env_file(file_path: Path, mtime_ns: int) -> tuple[tuple[str, str], ...]:
+    """.env を解析してキーと値の組を返す。
+
+    更新時刻をキャッシュキーに含めるため、.env を書き換えた場合だけ読み直す。
+
+    Parameters
+    ----------
+    file_path : pathlib.Path
+        読み込む .env パス。
+    mtime_ns : int
+        ファイルの更新時刻 (ns)。
+
+    Returns
+    -------
+    tuple[tuple[str, str], ...]
+        出現順のキーと値の組。
+    """
+    pairs = []
+    for line in file_path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line[0] == "#":
+            continue
+        key, sep, value = line.partition("=")
+        if sep:
+            pairs.append((key.strip(), value.strip()))
+    return tuple(pairs)
+
+
 def load_env_file(file_path: Path | None = None) -> None:
     """プロジェクト直下の .env を読み込み、未設定の環境変数だけを追加する。
 
@@ -17,20 +47,14 @@ def load_env_file(file_path: Path | None = None) -> None:
     if file_path is None:
         base = Path(__file__).resolve().parent.parent
         file_path = base / ".env"
-    if not file_path.exists():
+    try:
+        mtime_ns = file_path.stat().st_mtime_ns
+    except FileNotFoundError:
         return
 
-    for line in file_path.read_text(encoding="utf-8").splitlines():
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        if "=" not in line:
-            continue
-        key, value = line.split("=", 1)
-        key, value = key.strip(), value.strip()
-        # 既にOS環境にある場合は上書きしない
-        if key not in os.environ:
-            os.environ[key] = value
+    # 既にOS環境にある場合は上書きしない
+    for key, value in _parse_env_file(file_path, mtime_ns):
+        os.environ.setdefault(key, value)
 
 
 def get_env_list(key: str, default: Sequence[str]) -> List[str]:
@@ -52,3 +76,24 @@ def get_env_list(key: str, default: Sequence[str]) -> List[str]:
     if raw is None:
         return list(default)
     return [item.strip() for item in raw.split(",") if item.strip()]
+
+
+def get_env_int(key: str, default: int) -> int:
+    """環境変数を整数として取得する。
+
+    Parameters
+    ----------
+    key : str
+        環境変数名。
+    default : int
+        未設定または空文字の場合に返すデフォルト値。
+
+    Returns
+    -------
+    int
+        環境変数の値を整数化したもの。未設定時は default。
+    """
+    raw = os.getenv(key)
+    if not raw:
+        return default
+    return int(raw)
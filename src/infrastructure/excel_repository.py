@@ -1,11 +1,26 @@
 """インフラ層: pandas で Excel ログを読むリポジトリ実装。"""
-from typing import Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
 import datetime as dt
+import logging
 import pandas as pd
 from .paths import list_input_files
-from .env_settings import load_env_file, get_env_list
-from .cache import load_cached, store_cache, build_cache_key
-from ..domain.models import MergedLogDataset
+from .env_settings import load_env_file, get_env_list, get_env_int
+from .cache import (
+    load_cached,
+    store_cache,
+    build_cache_key,
+    merged_cache_path,
+    sheet_cache_path,
+    load_sheet_cache,
+    store_sheet_cache,
+)
+from ..domain.models import (
+    MergedLogDataset,
+    DEFAULT_TOLERANCE_MINUTES,
+    to_utc_datetime,
+)
 
 # デフォルト列（環境変数で上書き可能）
 DEFAULT_OPERATION_COLS = [
@@ -76,6 +91,9 @@ class ExcelLogRepository:
         load_env_file()
         operation_cols = get_env_list("OPERATION_COLS", DEFAULT_OPERATION_COLS)
         state_cols = get_env_list("STATE_COLS", DEFAULT_STATE_COLS)
+        tolerance_minutes = get_env_int(
+            "MERGE_TOLERANCE_MINUTES", DEFAULT_TOLERANCE_MINUTES
+        )
 
         files = list_input_files()
         if not files:
@@ -91,42 +109,159 @@ class ExcelLogRepository:
             end_date=end_date,
         )
 
+        # 突合済みの結果があれば merge_asof ごと省略する
+        merged_path = merged_cache_path(cache_key, tolerance_minutes)
+        merged = self._load_merged(merged_path)
+        if merged is not None:
+            return merged
+
         cached = load_cached(cache_key)
         if cached:
             op_df, state_df = cached
-            return MergedLogDataset.build_merged_dataset(
-                operation_df=op_df, state_df=state_df
-            )
-
-        op_df = pd.read_excel(
-            latest,
-            sheet_name="機器遠隔操作履歴",
-            usecols=operation_cols,
-            engine="openpyxl",
-        )
-        state_df = pd.read_excel(
-            latest,
-            sheet_name="機器状態変化履歴",
-            usecols=state_cols,
-            engine="openpyxl",
-        )
-        op_df["OrderReceiptDate"] = pd.to_datetime(
-            op_df["OrderReceiptDate"], utc=True, cache=True
-        )
-        state_df["ReportedDate"] = pd.to_datetime(
-            state_df["ReportedDate"], utc=True, cache=True
-        )
-        op_df = op_df[op_df["ContractId"].isin(contract_ids)]
-        state_df = state_df[state_df["ContractId"].isin(contract_ids)]
+            return self._build_and_store(op_df, state_df, tolerance_minutes, merged_path)
 
         start_ts = pd.to_datetime(start_date, utc=True)
-        op_df = op_df[op_df["OrderReceiptDate"] >= start_ts]
-        state_df = state_df[state_df["ReportedDate"] >= start_ts]
-        if end_date:
-            end_ts = pd.to_datetime(end_date, utc=True)
-            op_df = op_df[op_df["OrderReceiptDate"] <= end_ts]
-            state_df = state_df[state_df["ReportedDate"] <= end_ts]
+        end_ts = pd.to_datetime(end_date, utc=True) if end_date else None
+
+        # 2シートは独立しているため並行して読み込む
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            op_future = executor.submit(
+                self._read_sheet,
+                latest,
+                "機器遠隔操作履歴",
+                "op",
+                operation_cols,
+                contract_ids,
+                ("OrderReceiptDate", start_ts, end_ts),
+            )
+            state_future = executor.submit(
+                self._read_sheet,
+                latest,
+                "機器状態変化履歴",
+                "state",
+                state_cols,
+                contract_ids,
+                ("ReportedDate", start_ts, end_ts),
+            )
+            op_df, state_df = op_future.result(), state_future.result()
+        # 日時セルは datetime64 で読めているため、解析せず UTC を付与するだけにする
+        op_df["OrderReceiptDate"] = to_utc_datetime(op_df["OrderReceiptDate"])
+        state_df["ReportedDate"] = to_utc_datetime(state_df["ReportedDate"])
+        # ContractId の集合は一度だけ Index 化して両シートで使い回し、
+        # 条件はマスクにまとめて DataFrame の切り出しを1回で済ませる
+        ids = pd.Index(contract_ids)
+        op_mask = op_df["ContractId"].isin(ids) & (op_df["OrderReceiptDate"] >= start_ts)
+        state_mask = state_df["ContractId"].isin(ids) & (state_df["ReportedDate"] >= start_ts)
+        if end_ts is not None:
+            op_mask &= op_df["OrderReceiptDate"] <= end_ts
+            state_mask &= state_df["ReportedDate"] <= end_ts
+        op_df = op_df.loc[op_mask]
+        state_df = state_df.loc[state_mask]
         store_cache(cache_key, op_df, state_df)
-        return MergedLogDataset.build_merged_dataset(
-            operation_df=op_df, state_df=state_df
+        return self._build_and_store(op_df, state_df, tolerance_minutes, merged_path)
+
+    def _load_merged(self, merged_path: Path) -> Optional[MergedLogDataset]:
+        """突合済みキャッシュを読み込み、存在しない/壊れている場合は None を返す。
+
+        Parameters
+        ----------
+        merged_path : pathlib.Path
+            突合済み Parquet のパス。
+
+        Returns
+        -------
+        MergedLogDataset or None
+            キャッシュから復元したデータセット。
+        """
+        if not merged_path.exists():
+            return None
+        try:
+            return MergedLogDataset.from_parquet(str(merged_path))
+        except Exception as exc:  # 破損したキャッシュは作り直す
+            logging.warning("merged cache load failed (%s); regenerating cache", exc)
+            merged_path.unlink(missing_ok=True)
+            return None
+
+    def _build_and_store(
+        self,
+        op_df: pd.DataFrame,
+        state_df: pd.DataFrame,
+        tolerance_minutes: int,
+        merged_path: Path,
+    ) -> MergedLogDataset:
+        """突合して結果をキャッシュへ保存する。
+
+        Parameters
+        ----------
+        op_df : pandas.DataFrame
+            期間・ContractId で絞り込んだ操作ログ。
+        state_df : pandas.DataFrame
+            期間・ContractId で絞り込んだ状態変化ログ。
+        tolerance_minutes : int
+            突合の許容差（分）。
+        merged_path : pathlib.Path
+            突合済み Parquet の保存先。
+
+        Returns
+        -------
+        MergedLogDataset
+            突合済みデータセット。
+        """
+        merged = MergedLogDataset.build_merged_dataset(
+            operation_df=op_df, state_df=state_df, tolerance_minutes=tolerance_minutes
         )
+        try:
+            merged.to_parquet(str(merged_path))
+        except Exception as exc:  # 型が混在する列を選んだ場合の ArrowTypeError など
+            logging.warning("merged cache store failed (%s); continuing without cache", exc)
+            merged_path.unlink(missing_ok=True)
+        return merged
+
+    def _read_sheet(
+        self,
+        latest: Path,
+        sheet_name: str,
+        sheet_key: str,
+        usecols: Sequence[str],
+        contract_ids: Sequence[str],
+        date_range: Tuple[str, pd.Timestamp, Optional[pd.Timestamp]],
+    ) -> pd.DataFrame:
+        """シートを読み込む。初回はシート全体を Parquet 化し、以降は必要列・行だけ読む。
+
+        Parameters
+        ----------
+        latest : pathlib.Path
+            読み込む Excel ファイル。
+        sheet_name : str
+            シート名。
+        sheet_key : str
+            シートキャッシュのファイル名に使うキー。
+        usecols : Sequence[str]
+            返却する列一覧。
+        contract_ids : Sequence[str]
+            キャッシュ読み込み時に行を絞り込む ContractId 一覧。Excel から読んだ
+            場合は絞り込まずに返すため、呼び出し側でも改めて絞り込むこと。
+        date_range : tuple[str, pandas.Timestamp, pandas.Timestamp or None]
+            ``(日時列, 開始, 終了)``。キャッシュ読み込み時は期間外の行も Arrow 側で落とす。
+
+        Returns
+        -------
+        pandas.DataFrame
+            指定列のみの DataFrame。
+        """
+        cache_path = sheet_cache_path(latest, sheet_key)
+        cached = load_sheet_cache(cache_path, usecols, contract_ids, date_range)
+        if cached is not None:
+            return cached
+        # XLSX の XML 解析が支配的なため Rust 実装の calamine で読む。
+        # calamine は usecols に関わらずシート全体を解析するので、全列をキャッシュに残す
+        try:
+            df = pd.read_excel(latest, sheet_name=sheet_name, engine="calamine")
+        except ImportError as exc:  # python-calamine が入っていない環境
+            logging.warning("calamine unavailable (%s); falling back to openpyxl", exc)
+            df = pd.read_excel(latest, sheet_name=sheet_name, engine="openpyxl")
+        # キャッシュが残っているのは、型の混在で保存できなかった列を要求された場合。
+        # 作り直しても同じ列は保存できないため、書き直さずに Excel の結果だけを返す
+        if not cache_path.exists():
+            store_sheet_cache(cache_path, df)
+        return df.loc[:, list(usecols)]